@@ -86,6 +86,23 @@ STATICFILES_DIRS = [BASE_DIR / 'notes' / 'static']
 # Add this line near your STATIC_ROOT setting
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Cache: Redis when REDIS_URL is set, so every worker shares the search cache
+# and its invalidation. The local-memory fallback is private to each process.
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Supabase Configuration
 SUPABASE_URL = config("SUPABASE_URL")
 SUPABASE_KEY = config("SUPABASE_KEY")
@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Note
+from .models import Note, NoteStats
 
 
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
 	list_display = ('title', 'uploaded_by', 'uploaded_at')
-	search_fields = ('title', 'description', 'uploaded_by__username')
\ No newline at end of file
+	search_fields = ('title', 'description', 'uploaded_by__username')
+
+
+@admin.register(NoteStats)
+class NoteStatsAdmin(admin.ModelAdmin):
+	list_display = ('note', 'download_count', 'view_count', 'trending_score', 'updated_at')
+	ordering = ('-trending_score',)
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+Streaming ZIP bundles of several notes.
+
+The archive is written to a non-seekable sink, so zipfile emits data
+descriptors and every byte can be sent as soon as it is produced. Member
+files are fetched from Supabase on background threads: at most READ_AHEAD
+members are downloading at once, and each one buffers no more than
+QUEUE_CHUNKS chunks of CHUNK_SIZE bytes. Memory use therefore stays
+constant no matter how large the archive gets. A member that is given up
+on is cancelled, so its thread exits instead of holding a slot.
+"""
+import os
+import queue
+import threading
+import zipfile
+import requests
+import logging
+
+from . import counters
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CHUNK_SIZE = 64 * 1024  # bytes
+QUEUE_CHUNKS = 8  # chunks buffered per member
+READ_AHEAD = 3  # members fetched concurrently
+FETCH_TIMEOUT = 30  # seconds
+BUNDLE_SIGNED_URL_EXPIRY = 300  # seconds, members may wait in the read-ahead window
+MISSING_REPORT_NAME = 'MISSING.txt'
+STORED_EXTENSIONS = {
+    '.pdf', '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.mp3', '.mp4', '.m4a', '.mov', '.avi', '.mkv', '.webm',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub',
+}
+
+_DONE = object()
+
+
+class _StreamSink:
+    """Write-only file object that collects archive bytes for the response"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _MemberFetcher:
+    """Downloads one note in the background into a bounded queue"""
+
+    def __init__(self, note):
+        self.note = note
+        self._queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._cancelled = threading.Event()
+        threading.Thread(target=self._run, name=f"bundle-fetch-{note.id}", daemon=True).start()
+
+    def cancel(self):
+        """Stop the download; the thread exits at its next chunk"""
+        self._cancelled.set()
+
+    def _put(self, item):
+        # Give up once this member is cancelled so the thread can exit
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self):
+        item = self._queue.get(timeout=FETCH_TIMEOUT)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def _run(self):
+        try:
+            signed_url = self.note.get_signed_url(BUNDLE_SIGNED_URL_EXPIRY)
+            if not signed_url:
+                raise Exception("Could not generate signed URL.")
+
+            with requests.get(signed_url, stream=True, timeout=FETCH_TIMEOUT) as response:
+                response.raise_for_status()
+                # Content-Length is only the file size when the body isn't encoded
+                size = None
+                if 'Content-Encoding' not in response.headers:
+                    length = response.headers.get('Content-Length')
+                    size = int(length) if length and length.isdigit() else None
+                if not self._put(('ready', size)):
+                    return
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if not self._put(chunk):
+                        return
+            self._put(_DONE)
+        except Exception as e:
+            self._put(e)
+
+    def start(self):
+        """Wait until the file is available and return its size, if known"""
+        _, size = self._get()
+        return size
+
+    def chunks(self):
+        while True:
+            item = self._get()
+            if item is _DONE:
+                return
+            yield item
+
+
+# Helper functions
+def _failure_reason(e):
+    # queue.Empty from a consumer timeout has no message of its own
+    if isinstance(e, queue.Empty):
+        return f"fetch timed out after {FETCH_TIMEOUT}s"
+    return str(e)
+
+
+def _archive_name(note, used_names):
+    """Return a unique, path-free archive member name for a note"""
+    name = (note.file_name or f"note-{note.id}").replace('\\', '/').rsplit('/', 1)[-1]
+    name = name or f"note-{note.id}"
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used_names:
+        n += 1
+        candidate = f"{base} ({n}){ext}"
+    used_names.add(candidate)
+    return candidate
+
+
+def _compress_type(name):
+    """Store already-compressed formats as-is, deflate everything else"""
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+# ------------------ PUBLIC API ------------------
+
+def stream_zip(notes):
+    """
+    Yield a ZIP archive of `notes` chunk by chunk.
+    Notes whose file can't be fetched are skipped and listed in MISSING.txt.
+    A failure halfway through a member can't be reported over HTTP any
+    more, so it aborts the stream.
+    """
+    sink = _StreamSink()
+    fetchers = {}
+    started = []
+    # Reserved so a note's own file can't collide with the report
+    used_names = {MISSING_REPORT_NAME}
+    missing = []
+
+    try:
+        with zipfile.ZipFile(sink, 'w') as archive:
+            for index, note in enumerate(notes):
+                for ahead in notes[index:index + READ_AHEAD]:
+                    if ahead.id not in fetchers:
+                        fetchers[ahead.id] = _MemberFetcher(ahead)
+                        started.append(fetchers[ahead.id])
+                fetcher = fetchers.pop(note.id)
+
+                try:
+                    size = fetcher.start()
+                except Exception as e:
+                    fetcher.cancel()
+                    logger.error(f"Skipping note {note.id} in bundle: {_failure_reason(e)}")
+                    missing.append(note)
+                    continue
+
+                name = _archive_name(note, used_names)
+                info = zipfile.ZipInfo(name, date_time=note.uploaded_at.timetuple()[:6])
+                info.compress_type = _compress_type(name)
+                if size is not None:
+                    info.file_size = size
+
+                try:
+                    with archive.open(info, 'w', force_zip64=size is None) as member:
+                        for chunk in fetcher.chunks():
+                            member.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+                except Exception as e:
+                    logger.error(f"Bundle aborted while streaming note {note.id}: {_failure_reason(e)}")
+                    raise
+                counters.record_download(note.id)
+                yield sink.drain()
+
+            if missing:
+                lines = [f"{note.title} ({note.file_name or 'no file'})" for note in missing]
+                archive.writestr(
+                    MISSING_REPORT_NAME,
+                    "These notes could not be included:\n" + "\n".join(lines) + "\n",
+                )
+        # Central directory
+        yield sink.drain()
+    finally:
+        for fetcher in started:
+            fetcher.cancel()
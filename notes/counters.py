@@ -0,0 +1,164 @@
+"""
+Write-behind download/view counters for notes.
+
+Views call record_download()/record_view(), which only bump an in-memory
+buffer local to the worker process. A background flusher thread writes the
+buffer to NoteStats in a single batched transaction every FLUSH_INTERVAL
+seconds, or sooner once MAX_PENDING notes are waiting, so neither hot notes
+nor the request that happens to cross a threshold pay for the write.
+
+The trending score is kept in log space anchored to TRENDING_EPOCH:
+
+    trending_score = ln(sum(weight * exp((t_event - TRENDING_EPOCH) / TAU)))
+
+Ordering by this value is the same as ordering by exponentially decayed
+activity "now", but a row only has to be rewritten when it gets new events.
+"""
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+import atexit
+import math
+import threading
+import time
+import logging
+
+from .models import Note, NoteStats
+
+logger = logging.getLogger(__name__)
+
+# Constants
+FLUSH_INTERVAL = 30  # seconds
+MAX_PENDING = 500  # distinct notes buffered before forcing a flush
+DOWNLOAD_WEIGHT = 3.0
+VIEW_WEIGHT = 1.0
+TRENDING_HALF_LIFE = 3 * 24 * 60 * 60  # seconds
+TRENDING_TAU = TRENDING_HALF_LIFE / math.log(2)
+TRENDING_EPOCH = 1735689600  # 2025-01-01T00:00:00Z
+
+_lock = threading.Lock()
+_pending = {}  # note_id -> [downloads, views]
+_flush_requested = threading.Event()
+_flusher = None
+
+
+# Helper functions
+def _logaddexp(a, b):
+    """Numerically stable ln(exp(a) + exp(b))"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _activity_score(downloads, views, now):
+    """Log-space score contribution of a batch of events observed at `now`"""
+    weight = downloads * DOWNLOAD_WEIGHT + views * VIEW_WEIGHT
+    return math.log(weight) + (now - TRENDING_EPOCH) / TRENDING_TAU
+
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(FLUSH_INTERVAL)
+        _flush_requested.clear()
+        # Long-lived thread: drop connections that are stale or past CONN_MAX_AGE
+        close_old_connections()
+        flush()
+
+
+def _ensure_flusher():
+    """Start the flusher thread on first use, i.e. after any worker fork"""
+    global _flusher
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name='note-counter-flusher', daemon=True)
+            _flusher.start()
+
+
+def _record(note_id, downloads=0, views=0):
+    _ensure_flusher()
+    with _lock:
+        counts = _pending.setdefault(note_id, [0, 0])
+        counts[0] += downloads
+        counts[1] += views
+        if len(_pending) >= MAX_PENDING:
+            _flush_requested.set()
+
+
+def _requeue(batch):
+    """Put counts from a failed flush back into the buffer"""
+    with _lock:
+        for note_id, (downloads, views) in batch.items():
+            counts = _pending.setdefault(note_id, [0, 0])
+            counts[0] += downloads
+            counts[1] += views
+
+
+# ------------------ PUBLIC API ------------------
+
+def record_download(note_id):
+    """Count one download of a note (buffered)"""
+    _record(note_id, downloads=1)
+
+
+def record_view(note_id):
+    """Count one preview of a note (buffered)"""
+    _record(note_id, views=1)
+
+
+def flush():
+    """
+    Write all buffered counts to NoteStats in one transaction.
+    Rows are locked in primary key order so concurrent flushes from
+    other workers cannot deadlock. On failure the counts are kept
+    for the next attempt.
+    """
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+    if not batch:
+        return 0
+
+    try:
+        # Notes deleted since they were counted have nothing to update
+        note_ids = sorted(Note.objects.filter(id__in=batch.keys()).values_list('id', flat=True))
+        if not note_ids:
+            return 0
+
+        now = time.time()
+        with transaction.atomic():
+            NoteStats.objects.bulk_create(
+                [NoteStats(note_id=note_id) for note_id in note_ids],
+                ignore_conflicts=True,
+            )
+            rows = list(
+                NoteStats.objects.select_for_update()
+                .filter(note_id__in=note_ids)
+                .order_by('note_id')
+            )
+            updated_at = timezone.now()
+            for row in rows:
+                downloads, views = batch[row.note_id]
+                row.download_count += downloads
+                row.view_count += views
+                row.trending_score = _logaddexp(row.trending_score, _activity_score(downloads, views, now))
+                row.updated_at = updated_at
+            NoteStats.objects.bulk_update(
+                rows, ['download_count', 'view_count', 'trending_score', 'updated_at']
+            )
+        logger.debug(f"Flushed counters for {len(rows)} notes")
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Failed to flush note counters: {e}")
+        _requeue(batch)
+        return 0
+
+
+def trending_notes(limit):
+    """Return the `limit` most active notes, read from the trending index"""
+    stats = (
+        NoteStats.objects.select_related('note__uploaded_by')
+        .order_by('-trending_score')[:limit]
+    )
+    return [s.note for s in stats]
+
+
+# Don't lose the tail of the buffer when a worker is recycled
+atexit.register(flush)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from notes.search_cache import search_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show search result cache hit/miss statistics (shared cache only)"
+
+    def handle(self, *args, **options):
+        stats = search_cache_stats()
+        self.stdout.write(
+            f"Hits: {stats['hits']}\n"
+            f"Misses: {stats['misses']}\n"
+            f"Hit rate: {stats['hit_rate']:.1%}"
+        )
@@ -20,6 +20,7 @@ class Note(models.Model):
     file_path = models.CharField(max_length=MAX_FILE_PATH_LENGTH, blank=True, null=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-uploaded_at']
@@ -197,3 +198,28 @@ class Note(models.Model):
         """Return file size in human readable format (if available)."""
         # This would require additional metadata storage
         return "Unknown"
+
+
+class NoteStats(models.Model):
+    """
+    Aggregated download/view counters and trending score for a note.
+    Rows are written in batches by notes.counters, never per request.
+    """
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    download_count = models.PositiveIntegerField(default=0)
+    view_count = models.PositiveIntegerField(default=0)
+    # Log of the time-decayed activity, anchored to a fixed epoch so it only
+    # needs updating when new events arrive (see notes.counters).
+    trending_score = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Note stats'
+        verbose_name_plural = 'Note stats'
+        indexes = [
+            models.Index(fields=['-trending_score'], name='notestats_trending_idx'),
+            models.Index(fields=['-download_count'], name='notestats_downloads_idx'),
+        ]
+
+    def __str__(self):
+        return f"Stats for note {self.note_id}"
@@ -0,0 +1,186 @@
+"""
+Result cache for search_notes.
+
+Entries are keyed by the normalized query and page number, and hold only
+the note IDs for that page plus the total hit count, so a hit costs one
+`id__in` fetch and no COUNT(*). Every key embeds a generation number that
+is bumped whenever a Note is saved or deleted, which retires all older
+entries at once. Hydration only returns notes that still exist, so a stale
+entry can never show a deleted note.
+
+The generation and the hit/miss counters live in the default cache. With
+Redis configured (REDIS_URL) they are shared by all workers; with the
+local-memory fallback they are per worker process, so entries are kept
+for LOCAL_SEARCH_CACHE_TIMEOUT only to bound how long another worker's
+save or delete can go unnoticed.
+
+The cache is an optimization only: if it is unreachable, searches fall back
+to an uncached query and Note writes still succeed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import hashlib
+import unicodedata
+import logging
+
+from .models import Note
+
+logger = logging.getLogger(__name__)
+
+# Constants
+SEARCH_CACHE_TIMEOUT = 10 * 60  # seconds, shared cache
+LOCAL_SEARCH_CACHE_TIMEOUT = 60  # seconds, per-process cache
+GENERATION_KEY = 'notes:search:generation'
+STATS_KEY = 'notes:search:{}'
+STATS_LOG_EVERY = 100  # lookups
+
+
+# Helper functions
+def normalize_query(query):
+    """
+    Compose unicode (NFC) and collapse whitespace runs.
+    Case and compatibility forms are left alone: icontains compares them
+    with the database's rules, so folding them here would change results.
+    """
+    query = unicodedata.normalize('NFC', query)
+    return ' '.join(query.split())
+
+
+def _cache_timeout():
+    if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        return LOCAL_SEARCH_CACHE_TIMEOUT
+    return SEARCH_CACHE_TIMEOUT
+
+
+def _get_generation():
+    """Return the current generation, or None if the cache is unavailable"""
+    try:
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            cache.add(GENERATION_KEY, 0, timeout=None)
+            generation = cache.get(GENERATION_KEY, 0)
+        return generation
+    except Exception as e:
+        logger.warning(f"Search cache unavailable, reading generation failed: {e}")
+        return None
+
+
+def _cache_key(query, page_number):
+    """Return the cache key for a normalized query, or None if uncacheable"""
+    generation = _get_generation()
+    if generation is None:
+        return None
+    # ASCII case is ignored by icontains on every backend, so fold it for a
+    # better hit rate; non-ASCII case rules differ and are kept verbatim
+    if query.isascii():
+        query = query.lower()
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f"notes:search:{generation}:{digest}:{page_number}"
+
+
+def _incr(key):
+    """Increment a cache counter; returns None if the cache is unavailable"""
+    try:
+        try:
+            return cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, timeout=None):
+                return 1
+            return cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Search cache unavailable, incrementing {key} failed: {e}")
+        return None
+
+
+def _count(outcome):
+    count = _incr(STATS_KEY.format(outcome))
+    if count and count % STATS_LOG_EVERY == 0:
+        stats = search_cache_stats()
+        logger.info(
+            f"Search cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate)"
+        )
+
+
+def _hydrate(note_ids):
+    """Fetch notes for `note_ids` in one query, preserving their order"""
+    notes = Note.objects.select_related('uploaded_by').in_bulk(note_ids)
+    return [notes[note_id] for note_id in note_ids if note_id in notes]
+
+
+# ------------------ PUBLIC API ------------------
+
+def search_queryset(query):
+    """Notes whose title or description contains `query`, newest first"""
+    query = normalize_query(query)
+    return Note.objects.filter(
+        Q(title__icontains=query) | Q(description__icontains=query)
+    ).select_related('uploaded_by').order_by('-uploaded_at')
+
+
+def search_page(query, page_number, per_page):
+    """
+    Return the paginated search results for `query` as a Page, served
+    from the cache when possible.
+    """
+    query = normalize_query(query)
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        page_number = 1
+
+    key = _cache_key(query, page_number)
+    cached = None
+    if key is not None:
+        try:
+            cached = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Search cache unavailable, reading results failed: {e}")
+            key = None
+    if cached is not None:
+        _count('hits')
+        count, number, note_ids = cached
+        # range() gives the paginator its total without touching the database
+        paginator = Paginator(range(count), per_page)
+        return Page(_hydrate(note_ids), number, paginator)
+
+    _count('misses')
+    page = Paginator(search_queryset(query), per_page).get_page(page_number)
+    if key is not None:
+        note_ids = [note.id for note in page.object_list]
+        try:
+            cache.set(key, (page.paginator.count, page.number, note_ids), _cache_timeout())
+        except Exception as e:
+            logger.warning(f"Search cache unavailable, storing results failed: {e}")
+    return page
+
+
+def bump_generation():
+    """Invalidate every cached search result"""
+    if _incr(GENERATION_KEY) is None:
+        logger.error("Could not bump search cache generation; cached results may be stale")
+
+
+def search_cache_stats():
+    """Return hit/miss statistics from the cache"""
+    hits = cache.get(STATS_KEY.format('hits'), 0)
+    misses = cache.get(STATS_KEY.format('misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def _invalidate_search_cache(sender, using=None, **kwargs):
+    # After commit, so a cache failure can't roll back the write and a
+    # concurrent search can't re-cache pre-change results under the new generation
+    transaction.on_commit(bump_generation, using=using)
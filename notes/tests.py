@@ -1,3 +1,350 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from contextlib import ExitStack
+from unittest import mock
+import io
+import threading
+import time
+import zipfile
+
+from . import bundles, counters, search_cache, views
+from .models import Note, NoteStats
+
+
+class CountersFlushTests(TestCase):
+    """Write-behind counters in notes.counters"""
+
+    def setUp(self):
+        # Keep the background flusher out of the test transaction
+        patcher = mock.patch.object(counters, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        counters._pending.clear()
+        self.addCleanup(counters._pending.clear)
+
+        self.user = User.objects.create_user('alice', password='pw')
+        self.note = Note.objects.create(title='Algebra', uploaded_by=self.user)
+        self.other = Note.objects.create(title='Calculus', uploaded_by=self.user)
+
+    def test_flush_batches_buffered_counts(self):
+        for _ in range(3):
+            counters.record_download(self.note.id)
+        counters.record_view(self.note.id)
+        counters.record_view(self.other.id)
+
+        self.assertEqual(NoteStats.objects.count(), 0)
+        self.assertEqual(counters.flush(), 2)
+
+        stats = NoteStats.objects.get(note=self.note)
+        self.assertEqual((stats.download_count, stats.view_count), (3, 1))
+        stats = NoteStats.objects.get(note=self.other)
+        self.assertEqual((stats.download_count, stats.view_count), (0, 1))
+        self.assertEqual(counters._pending, {})
+
+    def test_flush_adds_to_existing_counts(self):
+        counters.record_download(self.note.id)
+        counters.flush()
+        counters.record_download(self.note.id)
+        counters.flush()
+
+        self.assertEqual(NoteStats.objects.get(note=self.note).download_count, 2)
+
+    def test_failed_flush_requeues_counts(self):
+        counters.record_download(self.note.id)
+        with mock.patch.object(NoteStats.objects, 'bulk_update', side_effect=Exception('db down')):
+            self.assertEqual(counters.flush(), 0)
+
+        self.assertEqual(counters._pending, {self.note.id: [1, 0]})
+        counters.flush()
+        self.assertEqual(NoteStats.objects.get(note=self.note).download_count, 1)
+
+    def test_flush_skips_deleted_notes(self):
+        counters.record_download(self.note.id)
+        counters.record_download(self.other.id)
+        self.other.delete()
+
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(list(NoteStats.objects.values_list('note_id', flat=True)), [self.note.id])
+        self.assertEqual(counters._pending, {})
+
+    def test_trending_prefers_recent_activity(self):
+        start = counters.TRENDING_EPOCH + 100 * counters.TRENDING_HALF_LIFE
+        with mock.patch('notes.counters.time.time', return_value=start):
+            for _ in range(10):
+                counters.record_download(self.note.id)
+            counters.flush()
+        self.assertEqual(counters.trending_notes(2), [self.note])
+
+        # Ten downloads decayed 16x still outweigh one fresh view...
+        later = start + 4 * counters.TRENDING_HALF_LIFE
+        with mock.patch('notes.counters.time.time', return_value=later):
+            counters.record_view(self.other.id)
+            counters.flush()
+        self.assertEqual(counters.trending_notes(2), [self.note, self.other])
+
+        # ...but not an extra fresh download
+        with mock.patch('notes.counters.time.time', return_value=later):
+            counters.record_download(self.other.id)
+            counters.flush()
+        self.assertEqual(counters.trending_notes(2), [self.other, self.note])
+
+
+class ConditionalListingTests(TestCase):
+    """ETag / 304 handling on listing pages"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.note = Note.objects.create(title='Algebra', uploaded_by=self.user)
+        self.client.force_login(self.user)
+        # The CSRF secret is part of the ETag; pick up the cookie first
+        self.client.get('/my_upload/')
+
+    def _revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        response = self._revalidate('/my_upload/')
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_edited_note_invalidates_etag(self):
+        etag = self.client.get('/my_upload/')['ETag']
+        self.note.title = 'Linear Algebra'
+        self.note.save()
+
+        response = self.client.get('/my_upload/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Linear Algebra')
+
+    def test_deleted_note_invalidates_etag(self):
+        Note.objects.create(title='Calculus', uploaded_by=self.user)
+        etag = self.client.get('/home/')['ETag']
+        self.note.delete()
+
+        response = self.client.get('/home/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchCacheTests(TestCase):
+    """Search result cache in notes.search_cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.notes = [
+            Note.objects.create(title=f'CS101 lecture {i}', uploaded_by=self.user)
+            for i in range(3)
+        ]
+
+    def test_normalize_query(self):
+        self.assertEqual(search_cache.normalize_query('  CS101 \t lecture\n'), 'CS101 lecture')
+        # Decomposed "é" composes to the same key as the precomposed one
+        self.assertEqual(search_cache.normalize_query('Cafe\u0301'), 'Caf\u00e9')
+        # Case and compatibility forms are left to the database comparison
+        self.assertEqual(search_cache.normalize_query('Straße'), 'Straße')
+        self.assertEqual(search_cache.normalize_query('ﬁle'), 'ﬁle')
+
+    def test_hit_skips_count_query(self):
+        with CaptureQueriesContext(connection) as miss_queries:
+            page = search_cache.search_page('cs101', '1', 2)
+        self.assertTrue(any('COUNT(' in q['sql'] for q in miss_queries))
+
+        with CaptureQueriesContext(connection) as hit_queries:
+            cached = search_cache.search_page(' cs101 ', 1, 2)
+        self.assertEqual(len(hit_queries), 1)
+        self.assertNotIn('COUNT(', hit_queries[0]['sql'])
+
+        self.assertEqual(list(cached), list(page))
+        self.assertEqual(cached.paginator.count, 3)
+        self.assertTrue(cached.has_next())
+        self.assertEqual(search_cache.search_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_ascii_case_variants_share_an_entry(self):
+        search_cache.search_page('CS101', 1, 10)
+        page = search_cache.search_page('cs101', 1, 10)
+
+        self.assertEqual(len(page), 3)
+        self.assertEqual(search_cache.search_cache_stats()['hits'], 1)
+        self.assertEqual(
+            search_cache._cache_key('CS101', 1), search_cache._cache_key('cs101', 1)
+        )
+        self.assertNotEqual(
+            search_cache._cache_key('STRASSE', 1), search_cache._cache_key('Straße', 1)
+        )
+
+    def test_save_and_delete_bump_generation_on_commit(self):
+        generation = search_cache._get_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.create(title='CS101 lecture 3', uploaded_by=self.user)
+            self.assertEqual(search_cache._get_generation(), generation)
+        self.assertEqual(search_cache._get_generation(), generation + 1)
+
+        search_cache.search_page('CS101', 1, 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        self.assertEqual(search_cache._get_generation(), generation + 2)
+        self.assertEqual(len(search_cache.search_page('CS101', 1, 10)), 3)
+
+    def _cache_down(self):
+        """Make every cache call used by search_cache raise, as a Redis outage would"""
+        stack = ExitStack()
+        for method in ('get', 'set', 'add', 'incr'):
+            stack.enter_context(
+                mock.patch.object(cache, method, side_effect=ConnectionError('cache down'))
+            )
+        return stack
+
+    def test_cache_outage_falls_back_to_uncached_search(self):
+        with self._cache_down(), self.assertLogs('notes.search_cache', level='WARNING'):
+            page = search_cache.search_page('CS101', 1, 2)
+        self.assertEqual(page.paginator.count, 3)
+        self.assertEqual(len(page), 2)
+
+    def test_cache_outage_does_not_block_note_writes(self):
+        with self._cache_down(), self.assertLogs('notes.search_cache', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.notes[0].delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                Note.objects.create(title='CS101 lecture 3', uploaded_by=self.user)
+        self.assertFalse(Note.objects.filter(id=self.notes[0].id).exists())
+        self.assertEqual(Note.objects.count(), 3)
+
+    def test_hydrate_drops_deleted_ids(self):
+        ids = [note.id for note in self.notes]
+        Note.objects.filter(id=ids[1]).delete()
+
+        hydrated = search_cache._hydrate(ids)
+        self.assertEqual([note.id for note in hydrated], [ids[0], ids[2]])
+
+
+class _FakeResponse:
+    """Minimal streaming stand-in for requests.Response"""
+
+    def __init__(self, chunks, size=None):
+        self._chunks = chunks
+        self.headers = {'Content-Length': str(size)} if size is not None else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return iter(self._chunks)
+
+
+def _endless_chunks():
+    while True:
+        yield b'x' * 1024
+
+
+class BundleTests(TestCase):
+    """Streaming ZIP bundles in notes.bundles"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        patcher = mock.patch.object(bundles.counters, 'record_download')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _note(self, file_name):
+        return Note.objects.create(
+            title=file_name, file_name=file_name, file_path=file_name, uploaded_by=self.user
+        )
+
+    def _bundle(self, notes, fake_get):
+        with mock.patch.object(Note, 'get_signed_url', autospec=True,
+                               side_effect=lambda note, expires_in: note.file_path), \
+                mock.patch.object(bundles.requests, 'get', side_effect=fake_get):
+            data = b''.join(bundles.stream_zip(notes))
+        return zipfile.ZipFile(io.BytesIO(data))
+
+    def test_slow_members_do_not_starve_later_ones(self):
+        slow = [self._note(f'slow{i}.pdf') for i in range(bundles.READ_AHEAD + 1)]
+        fast = [self._note(f'fast{i}.txt') for i in range(2)]
+
+        released = threading.Event()
+
+        def fake_get(url, **kwargs):
+            if url.startswith('slow'):
+                # Answers only after the bundle has given up, then never ends
+                released.wait(5)
+                return _FakeResponse(_endless_chunks())
+            return _FakeResponse([url.encode()], size=len(url))
+
+        with mock.patch.object(bundles, 'FETCH_TIMEOUT', 0.2), \
+                self.assertLogs('notes.bundles', level='ERROR') as logs:
+            archive = self._bundle(slow + fast, fake_get)
+
+        self.assertEqual(
+            archive.namelist(), ['fast0.txt', 'fast1.txt', bundles.MISSING_REPORT_NAME]
+        )
+        self.assertEqual(archive.read('fast1.txt'), b'fast1.txt')
+        self.assertIn('fetch timed out', logs.output[0])
+
+        # Cancelled fetchers exit once their late response arrives
+        released.set()
+        slow_threads = {f'bundle-fetch-{note.id}' for note in slow}
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            if not any(t.name in slow_threads for t in threading.enumerate()):
+                break
+            time.sleep(0.05)
+        self.assertFalse(any(t.name in slow_threads for t in threading.enumerate()))
+
+    def test_missing_report_name_is_reserved(self):
+        notes = [self._note('MISSING.txt'), self._note('gone.pdf')]
+
+        def fake_get(url, **kwargs):
+            if url == 'gone.pdf':
+                raise Exception('404 Not Found')
+            return _FakeResponse([b'notes'], size=5)
+
+        with self.assertLogs('notes.bundles', level='ERROR'):
+            archive = self._bundle(notes, fake_get)
+
+        self.assertEqual(archive.namelist(), ['MISSING (2).txt', 'MISSING.txt'])
+        self.assertEqual(archive.read('MISSING (2).txt'), b'notes')
+        self.assertIn(b'gone.pdf', archive.read('MISSING.txt'))
+
+
+class BundleViewTests(TestCase):
+    """Request handling in views.download_bundle"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+
+    def test_parse_note_ids_skips_duplicates(self):
+        self.assertEqual(views._parse_note_ids(['3,1, 3', '1,,2'], 3), ([3, 1, 2], None))
+        self.assertEqual(views._parse_note_ids(['1,x'], 3)[1], "Invalid note IDs.")
+        self.assertEqual(views._parse_note_ids(['\u00b2'], 3)[1], "Invalid note IDs.")
+
+    def test_too_many_ids_rejected_before_querying_notes(self):
+        ids = ','.join(str(i) for i in range(1, views.MAX_BUNDLE_NOTES + 2))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/download/bundle/', {'ids': ids})
+
+        self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+        self.assertFalse(any('notes_note' in q['sql'] for q in queries))
+
+    def test_duplicate_ids_within_limit_are_accepted(self):
+        note = Note.objects.create(
+            title='Algebra', file_name='a.txt', file_path='a.txt', uploaded_by=self.user
+        )
+        ids = ','.join([str(note.id)] * (views.MAX_BUNDLE_NOTES + 5))
+        with mock.patch.object(views.bundles, 'stream_zip', return_value=iter([b'zip'])) as stream:
+            response = self.client.get('/download/bundle/', {'ids': ids})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stream.call_args.args[0], [note])
 
-# Create your tests here.
@@ -11,6 +11,7 @@ path('delete/<int:note_id>/', views.delete_note, name='delete'),
 path('upload/', views.upload, name='upload'),
 path('note/<int:note_id>/', views.view_note, name='view_note'),
 path('download/<int:note_id>/', views.download_note, name='download'),
+path('download/bundle/', views.download_bundle, name='download_bundle'),
 path('search/', views.search_notes, name='search_notes'),
 path('register/', views.register, name='register'),
 path('login/', auth_views.LoginView.as_view(template_name='notes/login.html'), name='login'),
@@ -1,11 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Note, DEFAULT_SIGNED_URL_EXPIRY
+from django.db.models import Count, F, Max
+from django.utils.text import slugify
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+from functools import wraps
+from .models import Note, NoteStats, DEFAULT_SIGNED_URL_EXPIRY
 from .forms import NoteForm, RegisterForm
+from . import bundles, counters, search_cache
+import hashlib
 import requests
 import logging
 
@@ -13,7 +19,9 @@ logger = logging.getLogger(__name__)
 
 # Constants
 RECENT_NOTES_COUNT = 6
+TRENDING_NOTES_COUNT = 6
 PAGINATION_SIZE = 10
+MAX_BUNDLE_NOTES = 100
 
 
 # Helper functions
@@ -46,6 +54,76 @@ def _fetch_file_from_url(url, error_message="Failed to fetch file"):
         logger.error(f"{error_message}: {e}")
         return None, f"{error_message}: {e}"
 
+def _parse_note_ids(values, limit):
+    """
+    Helper function to parse comma-separated note IDs, skipping duplicates.
+    Stops as soon as more than `limit` distinct IDs are seen.
+    """
+    note_ids = {}
+    for value in values:
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if not (part.isascii() and part.isdigit()):
+                return None, "Invalid note IDs."
+            note_ids[int(part)] = None
+            if len(note_ids) > limit:
+                return None, f"A bundle can contain at most {limit} notes."
+    return list(note_ids), None
+
+
+# ------------------ CONDITIONAL GET ------------------
+
+def _make_etag(request, *parts):
+    """
+    Build an ETag from cheap queryset validators plus everything else the
+    rendered page depends on: the user, the query string and the CSRF
+    secret embedded in forms.
+    Views pass the newest updated_at (catches inserts and edits) and the
+    row count (catches deletes).
+    """
+    key = [
+        request.user.pk,
+        sorted(request.GET.lists()),
+        request.META.get('CSRF_COOKIE'),
+        *parts,
+    ]
+    return hashlib.md5(repr(key).encode()).hexdigest()
+
+def _home_etag(request):
+    notes = Note.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    stats = NoteStats.objects.aggregate(latest=Max('updated_at'))
+    return _make_etag(request, notes['latest'], notes['count'], stats['latest'])
+
+def _my_upload_etag(request):
+    notes = Note.objects.filter(uploaded_by=request.user).aggregate(
+        latest=Max('updated_at'), count=Count('id')
+    )
+    return _make_etag(request, notes['latest'], notes['count'])
+
+def _search_etag(request):
+    # Any insert or delete can change a result set, so validate against all notes
+    notes = Note.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    return _make_etag(request, notes['latest'], notes['count'])
+
+def _conditional_listing(etag_func):
+    """
+    Answer unchanged listing pages with 304 Not Modified before rendering.
+    Responses are private to the user and must be revalidated on every use.
+    """
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
 
 # ------------------ DOWNLOAD VIEW ------------------
 
@@ -68,6 +146,8 @@ def download_note(request, note_id):
         messages.error(request, error)
         return redirect('notes:home')
 
+    counters.record_download(note.id)
+
     # Determine content type
     content_type = 'application/pdf' if note.is_pdf else 'application/octet-stream'
     
@@ -75,6 +155,38 @@ def download_note(request, note_id):
     return _create_file_response(content, note.file_name, content_type, 'attachment')
 
 
+@login_required
+def download_bundle(request):
+    """
+    Streams several notes as one ZIP archive built on the fly.
+    Accepts either note IDs (?ids=1,2,3 or repeated ?ids=) or a search query (?q=).
+    """
+    query = request.GET.get('q', '').strip()
+    note_ids, error = _parse_note_ids(request.GET.getlist('ids'), MAX_BUNDLE_NOTES)
+    if error:
+        messages.error(request, error)
+        return redirect('notes:home')
+
+    if note_ids:
+        notes = Note.objects.filter(id__in=note_ids).order_by('-uploaded_at')
+        archive_name = 'notes'
+    elif query:
+        notes = search_cache.search_queryset(query)
+        archive_name = slugify(query) or 'notes'
+    else:
+        messages.error(request, "No notes selected.")
+        return redirect('notes:home')
+
+    notes = list(notes.exclude(file_path__isnull=True).exclude(file_path='')[:MAX_BUNDLE_NOTES])
+    if not notes:
+        messages.error(request, "No downloadable notes found.")
+        return redirect('notes:home')
+
+    response = StreamingHttpResponse(bundles.stream_zip(notes), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="noteshare-{archive_name}.zip"'
+    return response
+
+
 # ------------------ PREVIEW VIEW ------------------
 
 @login_required
@@ -98,8 +210,10 @@ def view_note(request, note_id):
             messages.error(request, error)
             return redirect('notes:home')
         
+        counters.record_view(note.id)
         return _create_file_response(content, note.file_name, 'application/pdf', 'inline')
 
+    counters.record_view(note.id)
     return render(request, 'notes/view_note.html', {'file_url': signed_url, 'note': note})
 
 
@@ -108,10 +222,20 @@ def index(request):
 
 
 @login_required
+@_conditional_listing(_home_etag)
 def home(request):
-    """Display recent notes and all notes with pagination"""
+    """Display recent, trending and all notes with pagination"""
     recent = Note.objects.order_by('-uploaded_at')[:RECENT_NOTES_COUNT]
-    all_notes = Note.objects.order_by('-uploaded_at')
+    trending = counters.trending_notes(TRENDING_NOTES_COUNT)
+
+    sort = request.GET.get('sort')
+    if sort == 'downloads':
+        all_notes = Note.objects.order_by(
+            F('stats__download_count').desc(nulls_last=True), '-uploaded_at'
+        )
+    else:
+        sort = 'recent'
+        all_notes = Note.objects.order_by('-uploaded_at')
     
     # Add pagination for all notes
     paginator = Paginator(all_notes, PAGINATION_SIZE)
@@ -120,12 +244,15 @@ def home(request):
     
     return render(request, 'notes/home.html', {
         'recent': recent, 
+        'trending': trending,
         'all_notes': page_obj,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'sort': sort,
     })
 
 
 @login_required
+@_conditional_listing(_my_upload_etag)
 def my_upload(request):
     """Display user's uploaded notes with pagination"""
     notes = Note.objects.filter(uploaded_by=request.user).order_by('-uploaded_at')
@@ -222,6 +349,7 @@ def login(request):
     return render(request, 'notes/login.html')
 
 
+@_conditional_listing(_search_etag)
 def search_notes(request):
     """Search notes by title with improved query handling"""
     query = request.GET.get('q', '').strip()
@@ -229,15 +357,9 @@ def search_notes(request):
     if not query:
         results = []
     else:
-        # Search in both title and description
-        results = Note.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        ).order_by('-uploaded_at')
-        
-        # Add pagination for search results
-        paginator = Paginator(results, PAGINATION_SIZE)
+        # Search in both title and description, paginated and cached
         page_number = request.GET.get('page')
-        results = paginator.get_page(page_number)
+        results = search_cache.search_page(query, page_number, PAGINATION_SIZE)
     
     return render(request, 'notes/search_result.html', {
         'query': query,